@@ -1,5 +1,10 @@
-from starlette.requests import Request
-from starlette.responses import Response
+from __future__ import annotations
+
+import typing
+
+if typing.TYPE_CHECKING:
+    from starlette.requests import Request
+    from starlette.responses import Response
 
 
 class StarletteCachesException(Exception):
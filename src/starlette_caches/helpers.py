@@ -9,6 +9,9 @@ from .exceptions import MissingCaching
 from .middleware import SCOPE_NAME, CacheMiddleware
 from .utils.cache import delete_from_cache
 
+# Shared by invalidations that don't pass any headers. `Headers` is immutable.
+_EMPTY_HEADERS = Headers()
+
 
 class _BaseCacheMiddlewareHelper:
     """Base class for helpers that need access to the `CacheMiddleware` instance."""
@@ -78,7 +81,9 @@ class CacheHelper(_BaseCacheMiddlewareHelper):
         if not isinstance(url, URL):
             url = self.request.url_for(url)
 
-        if not isinstance(headers, Headers):
+        if headers is None:
+            headers = _EMPTY_HEADERS
+        elif not isinstance(headers, Headers):
             headers = Headers(headers)
 
         await delete_from_cache(url, vary=headers, cache=self.middleware.cache)
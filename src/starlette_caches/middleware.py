@@ -1,34 +1,45 @@
 from __future__ import annotations
 
+import asyncio
 import typing
-from functools import partial
 
-from starlette.datastructures import MutableHeaders
 from starlette.requests import Request
-from starlette.responses import Response
 
-from .exceptions import DuplicateCaching, RequestNotCachable, ResponseNotCachable
-from .rules import Rule
+from .exceptions import DuplicateCaching, ResponseNotCachable
+from .rules import CompiledRules, Rule, get_rule_matching_request
 from .utils.cache import (
+    CACHABLE_METHODS,
     INVALIDATING_METHODS,
     CacheDirectives,
+    _CacheableResponse,
+    _get_from_cache,
+    cache_control_directives,
     delete_from_cache,
-    get_from_cache,
-    patch_cache_control,
-    store_in_cache,
+    get_expected_cache_key,
+    patch_raw_cache_control_directives,
+    prepare_response_for_cache,
+    write_response_to_cache,
 )
 from .utils.logging import HIT_EXTRA, MISS_EXTRA, get_logger
-from .utils.misc import kvformat
 
 if typing.TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Mapping, Sequence
 
     from aiocache.base import BaseCache as Cache
+    from starlette.responses import Response
     from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 
 SCOPE_NAME = "__starlette_caches__"
 
+# Upper bound on cache writes pending in the background for a single middleware.
+# Responses are not stored while this many writes are still in flight.
+MAX_BACKGROUND_WRITES = 256
+
+# Seconds a cache miss waits for a concurrent miss on the same response before
+# calling the application itself.
+MAX_PENDING_RESPONSE_WAIT = 10.0
+
 logger = get_logger(__name__)
 
 
@@ -45,6 +56,14 @@ class CacheMiddleware:
         app: The ASGI application to wrap.
         cache: The cache instance to use.
         rules: A sequence of rules for caching behavior.
+        background_write: Whether to store responses in the cache after sending them
+            to the client, rather than before. This removes the cache write latency
+            from cache misses, but the next request may not see the cached response
+            yet.
+        max_cacheable_bytes: The size in bytes above which response bodies are not
+            cached. By default, responses of any size are cached.
+        coalesce_misses: Whether concurrent cache misses for the same response wait
+            for the first one to be cached, rather than all calling the application.
 
     """
 
@@ -54,20 +73,34 @@ class CacheMiddleware:
         *,
         cache: Cache,
         rules: Sequence[Rule] | None = None,
+        background_write: bool = False,
+        max_cacheable_bytes: int | None = None,
+        coalesce_misses: bool = False,
     ) -> None:
         if rules is None:
             rules = [Rule()]
 
         self.app = app
         self.cache = cache
-        self.rules = rules
+        self.rules = rules if isinstance(rules, CompiledRules) else CompiledRules(rules)
+        self.background_writes: set[asyncio.Task] | None = (
+            set() if background_write else None
+        )
+        # Cache misses currently being computed, by expected cache key. Concurrent
+        # misses for the same key wait for the first one rather than all calling the
+        # app.
+        self.pending_responses: dict[str, asyncio.Event] | None = (
+            {} if coalesce_misses else None
+        )
+        self.max_cacheable_bytes = max_cacheable_bytes
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
 
-        if SCOPE_NAME in scope:
+        # Register this middleware and detect another one in a single lookup.
+        if scope.setdefault(SCOPE_NAME, self) is not self:
             raise DuplicateCaching(
                 "Another `CacheMiddleware` was detected in the middleware stack.\n"
                 "HINT: this exception probably occurred because:\n"
@@ -77,55 +110,152 @@ class CacheMiddleware:
                 "the application is already wrapped around a `CacheMiddleware`."
             )
 
-        scope[SCOPE_NAME] = self
+        if scope["method"] not in CACHABLE_METHODS:
+            await _call_uncachable(self.app, scope, receive, send, cache=self.cache)
+            return
 
         responder = CacheResponder(
             self.app,
             cache=self.cache,
             rules=self.rules,
+            background_writes=self.background_writes,
+            pending_responses=self.pending_responses,
+            max_cacheable_bytes=self.max_cacheable_bytes,
         )
         await responder(scope, receive, send)
 
 
+class _PendingResponse:
+    """A cache miss being computed, which concurrent misses on its key wait for."""
+
+    __slots__ = ("event", "key", "pending_responses")
+
+    def __init__(self, pending_responses: dict[str, asyncio.Event], key: str) -> None:
+        self.pending_responses = pending_responses
+        self.key = key
+        self.event = pending_responses[key] = asyncio.Event()
+
+    def release(self) -> None:
+        self.event.set()
+        if self.pending_responses.get(self.key) is self.event:
+            del self.pending_responses[self.key]
+
+
 class CacheResponder:
+    # A responder is created for every request, so skip the instance `__dict__`.
+    __slots__ = (
+        "app",
+        "background_writes",
+        "cache",
+        "initial_message",
+        "is_response_cachable",
+        "max_cacheable_bytes",
+        "pending_response",
+        "pending_responses",
+        "request",
+        "rules",
+        "send",
+    )
+
     def __init__(
         self,
         app: ASGIApp,
         *,
         cache: Cache,
         rules: Sequence[Rule],
+        background_writes: set[asyncio.Task] | None = None,
+        pending_responses: dict[str, asyncio.Event] | None = None,
+        max_cacheable_bytes: int | None = None,
     ) -> None:
         self.app = app
         self.cache = cache
         self.rules = rules
+        self.background_writes = background_writes
+        self.pending_responses = pending_responses
+        self.max_cacheable_bytes = max_cacheable_bytes
 
         self.initial_message: Message = {}
         self.is_response_cachable = True
         self.request: Request | None = None
+        self.pending_response: _PendingResponse | None = None
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         assert scope["type"] == "http"
 
+        # `CacheMiddleware` already handles other methods, but this may be used
+        # directly.
+        if scope["method"] not in CACHABLE_METHODS:
+            await _call_uncachable(self.app, scope, receive, send, cache=self.cache)
+            return
+
+        # Most apps only cache some of their paths, so check the rules against the
+        # raw path before paying for a `Request`.
+        if get_rule_matching_request(self.rules, path=scope["path"]) is None:
+            logger.trace("request_not_cachable reason=rule")
+            await self.app(scope, receive, send)
+            return
+
         self.request = request = Request(scope)
+        self.send = send
+
+        # The method and rules were checked above, so don't check them again.
+        response = await _get_from_cache(request, cache=self.cache)
+        if response is None and self.pending_responses is not None:
+            response = await self.wait_for_pending_response()
+        if response is not None:
+            logger.debug("cache_lookup %s", "HIT", extra=HIT_EXTRA)
+            # Replay the stored response as-is: its headers were rendered
+            # (and marked as a hit) before it was written to the cache.
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": response.status_code,
+                    "headers": response.raw_headers,
+                }
+            )
+            await send({"type": "http.response.body", "body": response.body})
+            return
+        logger.debug("cache_lookup %s", "MISS", extra=MISS_EXTRA)
 
         try:
-            response = await get_from_cache(request, cache=self.cache, rules=self.rules)
-        except RequestNotCachable:
-            if request.method in INVALIDATING_METHODS:
-                send = partial(self.send_then_invalidate, send=send)
-        else:
-            if response is not None:
-                logger.debug("cache_lookup %s", "HIT", extra=HIT_EXTRA)
-                await response(scope, receive, send)
-                return
-            send = partial(self.send_with_caching, send=send)
-            logger.debug("cache_lookup %s", "MISS", extra=MISS_EXTRA)
+            await self.app(scope, receive, self.send_with_caching)
+        finally:
+            self.release_pending_response()
 
-        await self.app(scope, receive, send)
+    async def wait_for_pending_response(self) -> Response | None:
+        """Wait for a concurrent miss of this response, then look up the cache again.
 
-    async def send_with_caching(self, message: Message, *, send: Send) -> None:
+        If there is none, register this request so that later misses wait for it.
+        """
+        assert self.request is not None
+        assert self.pending_responses is not None
+        # Requests for other variants of the URL don't wait on each other, once its
+        # varying headers are known.
+        key = get_expected_cache_key(self.request)
+        event = self.pending_responses.get(key)
+        if event is None:
+            self.pending_response = _PendingResponse(self.pending_responses, key)
+            return None
+
+        logger.trace("cache_lookup waiting for a concurrent request")
+        try:
+            await asyncio.wait_for(event.wait(), MAX_PENDING_RESPONSE_WAIT)
+        except asyncio.TimeoutError:
+            logger.trace("cache_lookup stopped waiting reason=timeout")
+            return None
+        # Still a miss if that response couldn't be cached. Compute this one as well
+        # rather than waiting again.
+        return await _get_from_cache(self.request, cache=self.cache)
+
+    def release_pending_response(self) -> None:
+        """Wake up the requests waiting for this one, once its outcome is known."""
+        pending_response, self.pending_response = self.pending_response, None
+        if pending_response is not None:
+            pending_response.release()
+
+    async def send_with_caching(self, message: Message) -> None:
         if not self.is_response_cachable:
-            await send(message)
+            await self.send(message)
             return
 
         if message["type"] == "http.response.start":
@@ -138,43 +268,112 @@ class CacheResponder:
         if message.get("more_body", False):
             logger.trace("response_not_cachable reason=is_streaming")
             self.is_response_cachable = False
-            await send(self.initial_message)
-            await send(message)
+        elif (
+            self.max_cacheable_bytes is not None
+            and len(message["body"]) > self.max_cacheable_bytes
+        ):
+            logger.trace("response_not_cachable reason=too_large")
+            self.is_response_cachable = False
+
+        if not self.is_response_cachable:
+            self.release_pending_response()
+            await self.send(self.initial_message)
+            await self.send(message)
             return
 
         assert self.request is not None
-        body = message["body"]
-        response = Response(content=body, status_code=self.initial_message["status"])
-        # NOTE: be sure not to mutate the original headers directly, as another Response
-        # object might be holding a reference to the same list.
-        response.raw_headers = list(self.initial_message["headers"])
+        response = _CacheableResponse(
+            status_code=self.initial_message["status"],
+            # NOTE: be sure not to mutate the original headers directly, as another
+            # Response object might be holding a reference to the same list.
+            raw_headers=list(self.initial_message["headers"]),
+            body=message["body"],
+        )
 
         try:
-            await store_in_cache(
+            ttl = prepare_response_for_cache(
                 response, request=self.request, cache=self.cache, rules=self.rules
             )
         except ResponseNotCachable:
             self.is_response_cachable = False
         else:
-            # Apply any headers added or modified by 'store_in_cache()'.
-            self.initial_message["headers"] = list(response.raw_headers)
+            if self.background_writes is None:
+                await write_response_to_cache(
+                    response, request=self.request, cache=self.cache, ttl=ttl
+                )
+            else:
+                self.write_in_background(response, ttl=ttl)
+            # Apply any headers added or modified by 'prepare_response_for_cache()'.
+            # The list is our own copy and is modified in place, so it can be sent
+            # as-is.
+            self.initial_message["headers"] = response.raw_headers
+        self.release_pending_response()
+
+        # These must stay sequential: ASGI servers expect the start message to be
+        # fully sent before the body, so they can't be gathered.
+        await self.send(self.initial_message)
+        await self.send(message)
+
+    def write_in_background(self, response: Response, *, ttl: float | None) -> None:
+        assert self.request is not None
+        assert self.background_writes is not None
+        if len(self.background_writes) >= MAX_BACKGROUND_WRITES:
+            logger.trace("background_write skipped reason=too_many_pending_writes")
+            return
+
+        # Writing to the cache modifies the response headers, so give the task its own
+        # copy rather than the headers about to be sent to the client.
+        stored_response = _CacheableResponse(
+            status_code=response.status_code,
+            raw_headers=list(response.raw_headers),
+            body=response.body,
+        )
+        task = asyncio.create_task(
+            self.write_response_to_cache(stored_response, ttl=ttl)
+        )
+        self.background_writes.add(task)
+        task.add_done_callback(self.background_writes.discard)
+
+        pending_response, self.pending_response = self.pending_response, None
+        if pending_response is not None:
+            # Keep concurrent misses waiting until the response is actually stored.
+            task.add_done_callback(lambda _: pending_response.release())
+
+    async def write_response_to_cache(
+        self, response: Response, *, ttl: float | None
+    ) -> None:
+        assert self.request is not None
+        try:
+            await write_response_to_cache(
+                response, request=self.request, cache=self.cache, ttl=ttl
+            )
+        except Exception:
+            logger.exception("background_write failed")
+
+
+async def _call_uncachable(
+    app: ASGIApp, scope: Scope, receive: Receive, send: Send, *, cache: Cache
+) -> None:
+    """Call the app for a request whose method is not cached."""
+    # Only safe methods are cached, so there is nothing to look up.
+    logger.trace("request_not_cachable reason=method")
+    if scope["method"] in INVALIDATING_METHODS:
+        send = _send_then_invalidate(send, scope=scope, cache=cache)
+    await app(scope, receive, send)
 
-        await send(self.initial_message)
-        await send(message)
 
-    async def send_then_invalidate(self, message: Message, *, send: Send) -> None:
+def _send_then_invalidate(send: Send, *, scope: Scope, cache: Cache) -> Send:
+    async def send_then_invalidate(message: Message) -> None:
         # listen for the response start message and invalidate the cache
         # if the request method is POST, PUT, PATCH, DELETE, and if the
         # response status code is 2xx or 3xx
-        assert self.request is not None
         if message["type"] == "http.response.start" and 200 <= message["status"] < 400:
-            await delete_from_cache(
-                self.request.url,
-                vary=self.request.headers,
-                cache=self.cache,
-            )
+            request = Request(scope)
+            await delete_from_cache(request.url, vary=request.headers, cache=cache)
         await send(message)
 
+    return send_then_invalidate
+
 
 class CacheControlMiddleware:
     """Middleware which handles Cache-Control headers for upstream cache proxies.
@@ -192,31 +391,48 @@ class CacheControlMiddleware:
 
     def __init__(self, app: ASGIApp, **kwargs: typing.Unpack[CacheDirectives]) -> None:
         self.app = app
+        # Not used anymore, but kept for backwards compatibility.
         self.kwargs = kwargs
+        # The directives never change, so only convert them once.
+        self.directives = cache_control_directives(**kwargs)
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         if scope["type"] != "http":
             await self.app(scope, receive, send)
             return
-        responder = CacheControlResponder(self.app, **self.kwargs)
+        responder = CacheControlResponder(self.app, directives=self.directives)
         await responder(scope, receive, send)
 
 
 class CacheControlResponder:
-    def __init__(self, app: ASGIApp, **kwargs: typing.Unpack[CacheDirectives]) -> None:
+    __slots__ = ("app", "directives", "send")
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        directives: Mapping[str, typing.Any] | None = None,
+        **kwargs: typing.Unpack[CacheDirectives],
+    ) -> None:
         self.app = app
-        self.kwargs = kwargs
+        # Directives may be converted once by the caller, e.g. by
+        # `CacheControlMiddleware`, rather than for every request.
+        if directives is None:
+            directives = cache_control_directives(**kwargs)
+        self.directives = directives
 
     async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
         assert scope["type"] == "http"
-        send = partial(self.send_with_caching, send=send)
-        await self.app(scope, receive, send)
+        self.send = send
+        await self.app(scope, receive, self.send_with_caching)
 
-    async def send_with_caching(self, message: Message, *, send: Send) -> None:
+    async def send_with_caching(self, message: Message) -> None:
         if message["type"] == "http.response.start":
-            logger.trace(f"patch_cache_control {kvformat(**self.kwargs)}")
-            headers = MutableHeaders(raw=list(message["headers"]))
-            patch_cache_control(headers, **self.kwargs)
-            message["headers"] = headers.raw
-
-        await send(message)
+            logger.trace("patch_cache_control %s", self.directives)
+            # NOTE: copy the headers, as the application might still hold a
+            # reference to the original list.
+            headers = list(message["headers"])
+            patch_raw_cache_control_directives(headers, self.directives)
+            message["headers"] = headers
+
+        await self.send(message)
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
 import re
+import sys
 import typing
-from dataclasses import dataclass
+from collections.abc import Sequence
+from dataclasses import dataclass, field
 
 if typing.TYPE_CHECKING:
-    from collections.abc import Iterable, Sequence
+    from collections.abc import Iterable
 
     from starlette.requests import Request
     from starlette.responses import Response
 
+# Slotted dataclasses are only available from Python 3.10.
+_DATACLASS_SLOTS: dict[str, typing.Any] = (
+    {"slots": True} if sys.version_info >= (3, 10) else {}
+)
 
-@dataclass
+
+@dataclass(frozen=True, **_DATACLASS_SLOTS)
 class Rule:
     """A rule for configuring caching behavior.
 
@@ -48,41 +55,214 @@ class Rule:
     default TTL will be used. A value of 0 will disable caching for the response.
     """
 
+    # Normalized forms of `match` and `status`, computed once at construction so
+    # that matching a request doesn't need to inspect the rule's arguments.
+    _match_all: bool = field(init=False, repr=False, compare=False)
+    _literals: frozenset[str] = field(init=False, repr=False, compare=False)
+    _patterns: tuple[re.Pattern, ...] = field(init=False, repr=False, compare=False)
+    _statuses: frozenset[int] | None = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        # Iterables are stored as tuples so that rules are hashable.
+        if isinstance(self.match, (str, re.Pattern)):
+            match: tuple[str | re.Pattern, ...] = (self.match,)
+        else:
+            match = tuple(self.match)
+            object.__setattr__(self, "match", match)
+        literals = frozenset(item for item in match if isinstance(item, str))
+        patterns = tuple(item for item in match if isinstance(item, re.Pattern))
+        object.__setattr__(self, "_match_all", "*" in literals)
+        object.__setattr__(self, "_literals", literals)
+        object.__setattr__(self, "_patterns", patterns)
+
+        statuses: frozenset[int] | None = None
+        if isinstance(self.status, int):
+            statuses = frozenset((self.status,))
+        elif self.status is not None:
+            status = tuple(self.status)
+            object.__setattr__(self, "status", status)
+            statuses = frozenset(status)
+        object.__setattr__(self, "_statuses", statuses)
+
+    def matches_path(self, path: str) -> bool:
+        """Return whether the request path matches this rule."""
+        if self._match_all:
+            return True
+        return path in self._literals or any(p.match(path) for p in self._patterns)
+
+    def matches_status(self, status_code: int) -> bool:
+        """Return whether the response status code matches this rule."""
+        return self._statuses is None or status_code in self._statuses
+
+
+class CompiledRules(Sequence[Rule]):
+    """An ordered sequence of rules, indexed by request path.
+
+    Literal paths are looked up in a dictionary, and regular expressions are combined
+    into a single one where possible, so that a request path is usually matched in a
+    single pass. Rules are still matched in order, using the first matching rule.
+
+    `CacheMiddleware` compiles its rules when it is created, so there is usually no
+    need to create this directly.
+    """
+
+    def __init__(self, rules: Iterable[Rule]) -> None:
+        self._rules = tuple(rules)
+
+        literal_rules: dict[str, list[int]] = {}
+        regex_rules: list[tuple[re.Pattern, int]] = []
+        wildcard_rules: list[int] = []
+        for index, rule in enumerate(self._rules):
+            if rule._match_all:  # noqa: SLF001
+                wildcard_rules.append(index)
+                continue
+            for path in rule._literals:  # noqa: SLF001
+                literal_rules.setdefault(path, []).append(index)
+            regex_rules.extend(
+                (pattern, index)
+                for pattern in rule._patterns  # noqa: SLF001
+            )
+
+        self._literal_rules = {
+            path: tuple(indices) for path, indices in literal_rules.items()
+        }
+        self._regex_rules = tuple(regex_rules)
+        self._wildcard_rules = tuple(wildcard_rules)
+
+        # Patterns without groups or flags of their own can be joined into a single
+        # alternation, each in its own group. Alternatives are tried in order, so the
+        # matched group is that of the first matching rule.
+        combined = [
+            (pattern, index)
+            for pattern, index in regex_rules
+            if isinstance(pattern.pattern, str)
+            and pattern.groups == 0
+            and pattern.flags == re.UNICODE
+        ]
+        self._combined_regex = (
+            re.compile("|".join(f"({pattern.pattern})" for pattern, _ in combined))
+            if combined
+            else None
+        )
+        self._combined_indices = tuple(index for _, index in combined)
+        self._uncombined_regex_rules = tuple(
+            item for item in regex_rules if item not in combined
+        )
+
+    @typing.overload
+    def __getitem__(self, index: int) -> Rule: ...
+
+    @typing.overload
+    def __getitem__(self, index: slice) -> Sequence[Rule]: ...
+
+    def __getitem__(self, index: int | slice) -> Rule | Sequence[Rule]:
+        return self._rules[index]
+
+    def __len__(self) -> int:
+        return len(self._rules)
+
+    def match_request(self, path: str) -> Rule | None:
+        """Return the first rule matching the request path."""
+        first = self._first_match(path)
+        return self._rules[first] if first < len(self._rules) else None
+
+    def match_response(self, path: str, status_code: int) -> Rule | None:
+        """Return the first rule matching the request path and response status."""
+        # Usually the first rule matching the path also matches the status, so only
+        # look further when it doesn't.
+        first = self._first_match(path)
+        if first == len(self._rules):
+            return None
+        if self._rules[first].matches_status(status_code):
+            return self._rules[first]
+
+        indices = {*self._literal_rules.get(path, ()), *self._wildcard_rules}
+        for pattern, index in self._regex_rules:
+            if index > first and pattern.match(path):
+                indices.add(index)
+        for index in sorted(indices):
+            rule = self._rules[index]
+            if index > first and rule.matches_status(status_code):
+                return rule
+        return None
+
+    def _first_match(self, path: str) -> int:
+        """Return the index of the first rule matching the request path.
+
+        The length of the rules is returned if none match.
+        """
+        # The first literal or wildcard rule bounds how many regular expressions
+        # need to be tested.
+        first = len(self._rules)
+        for indices in self._literal_rules.get(path, ()), self._wildcard_rules:
+            if indices and indices[0] < first:
+                first = indices[0]
+        if self._combined_regex is not None:
+            match = self._combined_regex.match(path)
+            if match is not None:
+                assert match.lastindex is not None
+                first = min(first, self._combined_indices[match.lastindex - 1])
+        for pattern, index in self._uncombined_regex_rules:
+            if index >= first:
+                break
+            if pattern.match(path):
+                first = index
+                break
+        return first
+
+
+@typing.overload
+def request_matches_rule(rule: Rule, *, request: Request) -> bool: ...
+
+
+@typing.overload
+def request_matches_rule(rule: Rule, *, path: str) -> bool: ...
+
 
 def request_matches_rule(
     rule: Rule,
     *,
-    request: Request,
+    request: Request | None = None,
+    path: str | None = None,
 ) -> bool:
-    match = (
-        [rule.match] if isinstance(rule.match, (str, re.Pattern)) else list(rule.match)
-    )
-    for item in match:
-        if isinstance(item, re.Pattern):
-            if item.match(request.url.path):
-                return True
-        elif item == "*" or item == request.url.path:
-            return True
-    return False
+    if path is None:
+        assert request is not None
+        path = request.scope["path"]
+    return rule.matches_path(path)
 
 
 def response_matches_rule(rule: Rule, *, request: Request, response: Response) -> bool:
     if not request_matches_rule(rule, request=request):
         return False
 
-    if rule.status is not None:
-        statuses = [rule.status] if isinstance(rule.status, int) else rule.status
-        if response.status_code not in statuses:
-            return False
-    return True
+    return rule.matches_status(response.status_code)
 
 
+@typing.overload
 def get_rule_matching_request(
     rules: Sequence[Rule], *, request: Request
+) -> Rule | None: ...
+
+
+@typing.overload
+def get_rule_matching_request(rules: Sequence[Rule], *, path: str) -> Rule | None: ...
+
+
+def get_rule_matching_request(
+    rules: Sequence[Rule],
+    *,
+    request: Request | None = None,
+    path: str | None = None,
 ) -> Rule | None:
-    return next(
-        (rule for rule in rules if request_matches_rule(rule, request=request)), None
-    )
+    if path is None:
+        assert request is not None
+        path = request.scope["path"]
+    if isinstance(rules, CompiledRules):
+        return rules.match_request(path)
+    for rule in rules:
+        if request_matches_rule(rule, path=path):
+            return rule
+    return None
 
 
 def get_rule_matching_response(
@@ -91,11 +271,9 @@ def get_rule_matching_response(
     request: Request,
     response: Response,
 ) -> Rule | None:
-    return next(
-        (
-            rule
-            for rule in rules
-            if response_matches_rule(rule, request=request, response=response)
-        ),
-        None,
-    )
+    if isinstance(rules, CompiledRules):
+        return rules.match_response(request.scope["path"], response.status_code)
+    for rule in rules:
+        if response_matches_rule(rule, request=request, response=response):
+            return rule
+    return None
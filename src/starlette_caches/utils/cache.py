@@ -9,11 +9,13 @@ defined in this module:
 
 from __future__ import annotations
 
+import functools
 import hashlib
 import time
 import typing
 from urllib.request import parse_http_list
 
+from aiocache.serializers import NullSerializer, PickleSerializer
 from starlette.responses import Response
 
 from ..exceptions import RequestNotCachable, ResponseNotCachable
@@ -22,7 +24,7 @@ from .logging import get_logger
 from .misc import bytes_to_json_string, http_date, json_string_to_bytes
 
 if typing.TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterable, Mapping, Sequence
 
     from aiocache import BaseCache
     from starlette.datastructures import URL, Headers, MutableHeaders
@@ -40,6 +42,10 @@ ONE_YEAR = 60 * 60 * 24 * 365
 
 INVALIDATING_METHODS = frozenset(("POST", "PUT", "PATCH", "DELETE"))
 
+# Values used to build the cache keys of a request are memoized in its ASGI scope
+# under this name, so that looking up and storing a response computes them once.
+KEYS_SCOPE_NAME = "starlette_caches.keys"
+
 
 class CacheDirectives(typing.TypedDict, total=False):
     max_age: int
@@ -80,11 +86,35 @@ async def store_in_cache(
     sending "Accept-Encoding: gzip", and "Accept-Encoding: identity" will result in
     different responses.
     """
+    ttl = prepare_response_for_cache(
+        response, request=request, cache=cache, rules=rules
+    )
+    await write_response_to_cache(response, request=request, cache=cache, ttl=ttl)
+
+
+def prepare_response_for_cache(
+    response: Response,
+    *,
+    request: Request,
+    cache: BaseCache,
+    rules: Sequence[Rule],
+) -> float | None:
+    """Check that a response can be cached, and add caching headers to it.
+
+    This is the synchronous half of `store_in_cache()`: the response is ready to be
+    sent to the client once this returns, and can be written to the cache using
+    `write_response_to_cache()` with the returned TTL.
+
+    Raises `ResponseNotCachable` if the response should not be cached.
+    """
     if response.status_code not in CACHABLE_STATUS_CODES:
         logger.trace("response_not_cachable reason=status_code")
         raise ResponseNotCachable(response)
 
-    if not request.cookies and "Set-Cookie" in response.headers:
+    # Only check for the presence of the headers, rather than parsing cookies.
+    if not _has_header(request.headers.raw, b"cookie") and _has_header(
+        response.raw_headers, b"set-cookie"
+    ):
         logger.trace("response_not_cachable reason=cookies_for_cookieless_request")
         raise ResponseNotCachable(response)
 
@@ -110,18 +140,51 @@ async def store_in_cache(
 
     logger.debug(f"store_in_cache max_age={max_age!r}")
 
-    # Store the cached response as a hit. The current request will have it
-    # set to miss before returning the response to the client. Future requests
-    # will load from the cache, and have it set to hit.
-    response.headers["X-Cache"] = "hit"
+    # Set X-Cache header to miss for the current request. The next request will
+    # load from the cache and have the X-Cache header set to hit.
+    response.headers["X-Cache"] = "miss"
 
     cache_headers = get_cache_response_headers(response, max_age=max_age)
     logger.trace(f"patch_response_headers headers={cache_headers!r}")
     response.headers.update(cache_headers)
 
+    # Apply the varying headers found when looking up this request now rather than
+    # when storing the response, so that the response sent to the client varies
+    # like the stored one even when it's stored after being sent.
+    learnt_varying_headers = _get_request_keys(request).get("learnt_varying_headers")
+    if learnt_varying_headers:
+        _merge_vary(response, learnt_varying_headers)
+
+    return ttl
+
+
+def _has_header(raw_headers: list[tuple[bytes, bytes]], name: bytes) -> bool:
+    """Return whether a non-empty header is present, given its lowercased name."""
+    return any(key == name and value for key, value in raw_headers)
+
+
+async def write_response_to_cache(
+    response: Response,
+    *,
+    request: Request,
+    cache: BaseCache,
+    ttl: float | None,
+) -> None:
+    """Store a response prepared by `prepare_response_for_cache()` in the cache."""
+    # Store the cached response as a hit. The current request will have it
+    # set to miss before returning the response to the client. Future requests
+    # will load from the cache, and have it set to hit.
+    response.headers["X-Cache"] = "hit"
+
     cache_key = await learn_cache_key(request, response, cache=cache)
     logger.trace(f"learnt_cache_key cache_key={cache_key!r}")
-    serialized_response = serialize_response(response)
+    serialized_response: dict | tuple
+    if isinstance(cache.serializer, (NullSerializer, PickleSerializer)):
+        # These serializers keep Python objects as-is, so skip the JSON-compatible
+        # encoding of the response.
+        serialized_response = pack_response(response)
+    else:
+        serialized_response = serialize_response(response)
     logger.trace(
         f"store_response_in_cache key={cache_key!r} value={serialized_response!r}"
     )
@@ -129,7 +192,15 @@ async def store_in_cache(
     if ttl is not None:
         kwargs["ttl"] = ttl
 
-    await cache.set(key=cache_key, value=serialized_response, **kwargs)
+    if request.method == "HEAD":
+        # Don't replace a response cached from a GET request, as the application may
+        # have left out the body of this one.
+        try:
+            await cache.add(key=cache_key, value=serialized_response, **kwargs)
+        except ValueError:
+            logger.trace("store_response_in_cache skipped reason=already_cached")
+    else:
+        await cache.set(key=cache_key, value=serialized_response, **kwargs)
 
     # Set X-Cache header to miss for the current request. The next request will
     # load from the cache and have the X-Cache header set to hit.
@@ -146,12 +217,12 @@ async def get_from_cache(
 
     A `None` return value indicates that the response for this
     request can (and should) be added to the cache once computed.
+
+    Caches may provide a synchronous `exists_sync(key)` method (e.g. for in-process
+    backends). When present, it is used to skip the asynchronous lookup for URLs that
+    haven't been cached yet. It receives the key built by `cache.build_key()`, which
+    includes the cache's namespace.
     """
-    logger.trace(
-        f"get_from_cache "
-        f"request.url={str(request.url)!r} "
-        f"request.method={request.method!r}"
-    )
     if request.method not in CACHABLE_METHODS:
         logger.trace("request_not_cachable reason=method")
         raise RequestNotCachable(request)
@@ -161,23 +232,40 @@ async def get_from_cache(
         logger.trace("request_not_cachable reason=rule")
         raise RequestNotCachable(request)
 
-    logger.trace("lookup_cached_response method='GET'")
-    # Try to retrieve the cached GET response (even if this is a HEAD request).
-    cache_key = await get_cache_key(request, method="GET", cache=cache)
-    if cache_key is None:
+    return await _get_from_cache(request, cache=cache)
+
+
+async def _get_from_cache(request: Request, *, cache: BaseCache) -> Response | None:
+    """Look up a cached response, once the request is known to be cachable."""
+    logger.trace(
+        f"get_from_cache "
+        f"request.url={str(request.url)!r} "
+        f"request.method={request.method!r}"
+    )
+    varying_headers_cache_key = get_request_varying_headers_cache_key(
+        request, cache=cache
+    )
+    if _is_missing_sync(varying_headers_cache_key, cache=cache):
         logger.trace("cache_key found=False")
         return None
-    logger.trace(f"cache_key found=True cache_key={cache_key!r}")
-    serialized_response: dict | None = await cache.get(cache_key)
 
-    # If not present, fallback to look for a cached HEAD response.
-    if serialized_response is None:
-        logger.trace("lookup_cached_response method='HEAD'")
-        cache_key = await get_cache_key(request, method="HEAD", cache=cache)
-        assert cache_key is not None
-        logger.trace(f"cache_key found=True cache_key={cache_key!r}")
-        serialized_response = await cache.get(cache_key)
+    # GET and HEAD requests share the same cache key. Most responses don't vary, so
+    # the response cached for no varying headers is fetched along with the varying
+    # headers, in a single round trip.
+    cache_key = get_request_cache_key(request, varying_headers=[])
+    varying_headers, serialized_response = await cache.multi_get(
+        [varying_headers_cache_key, cache_key]
+    )
+    if varying_headers is None:
+        logger.trace("cache_key found=False")
+        return None
+    # Remember them in case the response has to be computed and stored.
+    _get_request_keys(request)["learnt_varying_headers"] = varying_headers
 
+    if varying_headers:
+        cache_key = get_request_cache_key(request, varying_headers=varying_headers)
+        serialized_response = await cache.get(cache_key)
+    logger.trace(f"cache_key found=True cache_key={cache_key!r}")
     if serialized_response is None:
         logger.trace("cached_response found=False")
         return None
@@ -185,7 +273,12 @@ async def get_from_cache(
     logger.trace(
         f"cached_response found=True key={cache_key!r} value={serialized_response!r}"
     )
-    return deserialize_response(serialized_response)
+    response = deserialize_response(serialized_response)
+    if request.method == "GET" and _is_stripped_head_response(response):
+        logger.trace("cached_response found=False reason=head_only")
+        return None
+
+    return response
 
 
 async def delete_from_cache(url: URL, *, vary: Headers, cache: BaseCache) -> None:
@@ -196,21 +289,55 @@ async def delete_from_cache(url: URL, *, vary: Headers, cache: BaseCache) -> Non
         # Nothing to do, as there's no cache key associated to this URL.
         return
 
-    for method in "GET", "HEAD":
-        cache_key = generate_cache_key(
-            url,
-            method=method,
-            headers=vary,
-            varying_headers=varying_headers,
-            cache=cache,
-        )
+    cache_key = generate_cache_key(
+        url,
+        method="GET",
+        headers=vary,
+        varying_headers=varying_headers,
+        cache=cache,
+    )
 
-        logger.trace(f"clear_cache key={cache_key!r}")
-        await cache.delete(cache_key)
+    logger.trace(f"clear_cache key={cache_key!r}")
+    await cache.delete(cache_key)
 
     await cache.delete(varying_headers_cache_key)
 
 
+def _is_stripped_head_response(response: Response) -> bool:
+    """Return whether a cached response was stored without the body it announces.
+
+    Responses to HEAD requests are cached under the same key as GET requests. They
+    can't be used for a GET request if the application left out their body.
+    """
+    if response.body:
+        return False
+    for key, value in response.raw_headers:
+        if key == b"content-length":
+            return value not in (b"", b"0")
+    return False
+
+
+class _CacheableResponse(Response):
+    """A response assembled from already rendered parts.
+
+    The status code, headers and body are stored as-is, skipping the header
+    rendering done by `Response.__init__()`, as the wrapped application (or the
+    response that was cached) already did it.
+    """
+
+    def __init__(
+        self,
+        *,
+        status_code: int,
+        raw_headers: list[tuple[bytes, bytes]],
+        body: bytes | memoryview,
+    ) -> None:
+        self.status_code = status_code
+        self.raw_headers = raw_headers
+        self.body = body
+        self.background = None
+
+
 def serialize_response(response: Response) -> dict:
     """Convert a response to JSON format.
 
@@ -224,8 +351,13 @@ def serialize_response(response: Response) -> dict:
     }
 
 
-def deserialize_response(serialized_response: dict) -> Response:
-    """Re-build the original response object from a json-serialized object."""
+def deserialize_response(serialized_response: dict | tuple) -> Response:
+    """Re-build the original response object from a json-serialized object.
+
+    Tuples built by `pack_response()` are also accepted.
+    """
+    if not isinstance(serialized_response, dict):
+        return unpack_response(serialized_response)
     return Response(
         content=json_string_to_bytes(serialized_response["content"]),
         status_code=serialized_response["status_code"],
@@ -233,6 +365,27 @@ def deserialize_response(serialized_response: dict) -> Response:
     )
 
 
+def pack_response(
+    response: Response,
+) -> tuple[int, tuple[tuple[bytes, bytes], ...], bytes]:
+    """Convert a response to a compact tuple, for caches storing Python objects.
+
+    Unlike `serialize_response()`, the body and raw headers are kept as bytes.
+    """
+    return (response.status_code, tuple(response.raw_headers), bytes(response.body))
+
+
+def unpack_response(
+    packed_response: tuple[int, tuple[tuple[bytes, bytes], ...], bytes],
+) -> Response:
+    """Re-build the original response object from a tuple built by `pack_response()`."""
+    status_code, raw_headers, body = packed_response
+    # NOTE: the tuple may be shared with the cache, so give the response its own list.
+    return _CacheableResponse(
+        status_code=status_code, raw_headers=list(raw_headers), body=body
+    )
+
+
 async def learn_cache_key(
     request: Request, response: Response, *, cache: BaseCache
 ) -> str:
@@ -246,19 +399,12 @@ async def learn_cache_key(
         f"request.method={request.method!r} "
         f"response.headers.Vary={response.headers.get('Vary')!r}"
     )
-    url = request.url
-    varying_headers_cache_key = generate_varying_headers_cache_key(url, cache=cache)
-
-    cached_vary_headers = set(await cache.get(key=varying_headers_cache_key) or ())
-    response_vary_headers = {
-        header.lower() for header in parse_http_list(response.headers.get("Vary", ""))
-    }
+    varying_headers_cache_key = get_request_varying_headers_cache_key(
+        request, cache=cache
+    )
 
-    # workaround for when a route doesn't always add a Vary header
-    # Caveat: only effective when a varied requested is sent first
-    varying_headers = sorted(response_vary_headers | cached_vary_headers)
-    if varying_headers:
-        response.headers["Vary"] = ", ".join(varying_headers)
+    cached_vary_headers = await cache.get(key=varying_headers_cache_key) or ()
+    varying_headers = _merge_vary(response, cached_vary_headers)
 
     logger.trace(
         "store_varying_headers "
@@ -266,13 +412,21 @@ async def learn_cache_key(
     )
     await cache.set(key=varying_headers_cache_key, value=varying_headers)
 
-    return generate_cache_key(
-        url,
-        method=request.method,
-        headers=request.headers,
-        varying_headers=varying_headers,
-        cache=cache,
-    )
+    return get_request_cache_key(request, varying_headers=varying_headers)
+
+
+def _merge_vary(response: Response, varying_headers: Iterable[str]) -> list[str]:
+    """Add headers varied on by previous responses to the Vary header of a response.
+
+    Return the resulting varying headers, sorted.
+    """
+    # workaround for when a route doesn't always add a Vary header
+    # Caveat: only effective when a varied requested is sent first
+    response_vary_headers = parse_vary(response.headers.get("Vary", ""))
+    merged_varying_headers = sorted(response_vary_headers.union(varying_headers))
+    if merged_varying_headers:
+        response.headers["Vary"] = ", ".join(merged_varying_headers)
+    return merged_varying_headers
 
 
 async def get_cache_key(request: Request, method: str, cache: BaseCache) -> str | None:
@@ -281,9 +435,10 @@ async def get_cache_key(request: Request, method: str, cache: BaseCache) -> str
     If this request hasn't been served before, return `None` as there definitely
     won't be any matching cached response.
     """
-    url = request.url
-    logger.trace(f"get_cache_key request.url={str(url)!r} method={method!r}")
-    varying_headers_cache_key = generate_varying_headers_cache_key(url, cache=cache)
+    logger.trace(f"get_cache_key request.url={str(request.url)!r} method={method!r}")
+    varying_headers_cache_key = get_request_varying_headers_cache_key(
+        request, cache=cache
+    )
     varying_headers = await cache.get(varying_headers_cache_key)
 
     if varying_headers is None:
@@ -291,13 +446,15 @@ async def get_cache_key(request: Request, method: str, cache: BaseCache) -> str
         return None
     logger.trace(f"varying_headers found=True headers={varying_headers!r}")
 
-    return generate_cache_key(
-        request.url,
-        method=method,
-        headers=request.headers,
-        varying_headers=varying_headers,
-        cache=cache,
-    )
+    assert method in CACHABLE_METHODS
+    return get_request_cache_key(request, varying_headers=varying_headers)
+
+
+def _is_missing_sync(key: str, *, cache: BaseCache) -> bool:
+    """Return whether the cache's `exists_sync()` method reports a key as missing."""
+    exists_sync = getattr(cache, "exists_sync", None)
+    # Unlike `get()`, this is called with the key already namespaced by the cache.
+    return exists_sync is not None and not exists_sync(cache.build_key(key))
 
 
 def generate_cache_key(
@@ -309,23 +466,125 @@ def generate_cache_key(
 ) -> str:
     """Generate a cache key from the request full URL and varying response headers.
 
-    Note that the given `method` may be different from that of the request, e.g.
-    because we're trying to find a response cached from a previous GET request
-    while this one is a HEAD request. (This is OK because web servers will strip content
-    from responses to a HEAD request before sending them on the wire.)
+    GET and HEAD requests share the same cache key, so that a response cached from a
+    GET request can be used for a HEAD request, and the other way around. (This is OK
+    because web servers will strip content from responses to a HEAD request before
+    sending them on the wire.)
     """
     assert method in CACHABLE_METHODS
+    url_hash = hash_url(url)
+    vary_hash = hash_varying_headers(headers, varying_headers)
+    return f"cache_page.{url_hash}.{vary_hash}"
 
-    ctx = hashlib.md5(usedforsecurity=False)
-    for header in varying_headers:
-        value = headers.get(header)
-        if value is not None:
-            ctx.update(value.encode())
-    vary_hash = ctx.hexdigest()
 
-    url_hash = hashlib.md5(str(url).encode("ascii"), usedforsecurity=False).hexdigest()
+def get_expected_cache_key(request: Request) -> str:
+    """Return the cache key a response to the request is expected to be stored at.
 
-    return f"cache_page.{method}.{url_hash}.{vary_hash}"
+    This relies on the varying headers found by `get_from_cache()` for the request.
+    If none were found, the key of a response that doesn't vary is returned.
+    """
+    keys = _get_request_keys(request)
+    varying_headers = keys.get("learnt_varying_headers") or []
+    return get_request_cache_key(request, varying_headers=varying_headers)
+
+
+def get_request_cache_key(request: Request, *, varying_headers: list[str]) -> str:
+    """Return `generate_cache_key()` for a request, reusing its memoized hashes."""
+    keys = _get_request_keys(request)
+
+    url_hash = keys.get("url_hash")
+    if url_hash is None:
+        url_hash = keys["url_hash"] = hash_url(request.url)
+
+    # The varying headers learnt when storing a response may differ from those used
+    # to look it up, so remember which ones the hash is for.
+    vary = keys.get("vary")
+    if vary is not None and vary[0] == varying_headers:
+        vary_hash = vary[1]
+    else:
+        # Map the request headers once, however many varying headers are looked up.
+        header_values = keys.get("header_values")
+        if header_values is None and varying_headers:
+            header_values = keys["header_values"] = _first_header_values(
+                request.headers.raw
+            )
+        vary_hash = _hash_header_values(header_values or {}, varying_headers)
+        keys["vary"] = (varying_headers, vary_hash)
+
+    return f"cache_page.{url_hash}.{vary_hash}"
+
+
+def _get_request_keys(request: Request) -> dict[str, typing.Any]:
+    scope = request.scope
+    # Everything the request URL and headers are built from.
+    source = (
+        scope.get("scheme"),
+        scope.get("server"),
+        scope["path"],
+        scope.get("query_string"),
+        scope["headers"],
+    )
+    keys = scope.get(KEYS_SCOPE_NAME)
+    # The scope may have been copied from another request, e.g. to change its path,
+    # in which case the memoized values don't apply.
+    if keys is None or keys["source"] != source:
+        keys = scope[KEYS_SCOPE_NAME] = {"source": source}
+    return keys
+
+
+def new_key_hash() -> hashlib.blake2b:
+    """Return a new hash object to compute a cache key with.
+
+    Keys must match across processes sharing a cache, so the algorithm is fixed. It
+    doesn't need to be cryptographically secure, and 128 bits make collisions
+    negligible.
+    """
+    return hashlib.blake2b(digest_size=16)
+
+
+def hash_url(url: URL) -> str:
+    """Hash the full URL, for use in a cache key."""
+    url_ctx = new_key_hash()
+    url_ctx.update(str(url).encode("ascii"))
+    return url_ctx.hexdigest()
+
+
+def hash_varying_headers(headers: Headers, varying_headers: Sequence[str]) -> str:
+    """Hash the values of the varying request headers, for use in a cache key."""
+    header_values = _first_header_values(headers.raw) if varying_headers else {}
+    return _hash_header_values(header_values, varying_headers)
+
+
+def _first_header_values(raw_headers: list[tuple[bytes, bytes]]) -> dict[bytes, bytes]:
+    """Map raw header names to their first value, in a single pass."""
+    values: dict[bytes, bytes] = {}
+    for name, value in raw_headers:
+        values.setdefault(name, value)
+    return values
+
+
+def _hash_header_values(
+    header_values: Mapping[bytes, bytes], varying_headers: Sequence[str]
+) -> str:
+    ctx = new_key_hash()
+    if varying_headers:
+        # Hash the (name, value) pairs as a whole, so that values can't run into each
+        # other, e.g. "ab" and "" must not hash like "a" and "b".
+        names = sorted(header.encode("latin-1") for header in varying_headers)
+        pairs = tuple((name, header_values.get(name, b"")) for name in names)
+        ctx.update(repr(pairs).encode("ascii"))
+    return ctx.hexdigest()
+
+
+def get_request_varying_headers_cache_key(request: Request, *, cache: BaseCache) -> str:
+    """Return `generate_varying_headers_cache_key()` for a request, memoized."""
+    keys = _get_request_keys(request)
+    key = keys.get("varying_headers")
+    if key is None:
+        key = keys["varying_headers"] = generate_varying_headers_cache_key(
+            request.url, cache=cache
+        )
+    return key
 
 
 def generate_varying_headers_cache_key(url: URL, cache: BaseCache) -> str:
@@ -333,7 +592,8 @@ def generate_varying_headers_cache_key(url: URL, cache: BaseCache) -> str:
 
     Suitable for associating varying headers to a requested URL.
     """
-    url_hash = hashlib.md5(str(url.path).encode("ascii"), usedforsecurity=False)
+    url_hash = new_key_hash()
+    url_hash.update(str(url.path).encode("ascii"))
     return f"varying_headers.{url_hash.hexdigest()}"
 
 
@@ -359,45 +619,125 @@ def patch_cache_control(
 
     True values are added as flags, while false values are omitted.
     """
-    cache_control: dict[str, typing.Any] = {}
-    value: typing.Any
-    for field in parse_http_list(headers.get("Cache-Control", "")):
-        try:
-            key, value = field.split("=")
-        except ValueError:  # noqa: PERF203
-            cache_control[field] = True
-        else:
-            cache_control[key] = value
+    patch_cache_control_directives(headers, cache_control_directives(**kwargs))
+
+
+def cache_control_directives(
+    **kwargs: typing.Unpack[CacheDirectives],
+) -> dict[str, typing.Any]:
+    """Convert keyword arguments to Cache-Control directive names.
+
+    For example, `max_age=60` becomes `{"max-age": 60}`.
+    """
+    return {key.replace("_", "-"): value for key, value in kwargs.items()}
+
+
+def patch_cache_control_directives(
+    headers: MutableHeaders, directives: Mapping[str, typing.Any]
+) -> None:
+    """Patch headers with directives built by `cache_control_directives()`.
+
+    See `patch_cache_control()`. This allows directives to be built once and applied
+    to many responses.
+    """
+    patched_cache_control = merge_cache_control(
+        headers.get("Cache-Control", ""), directives
+    )
+
+    if patched_cache_control:
+        headers["Cache-Control"] = patched_cache_control
+    else:
+        del headers["Cache-Control"]
+
+
+def patch_raw_cache_control_directives(
+    raw_headers: list[tuple[bytes, bytes]], directives: Mapping[str, typing.Any]
+) -> None:
+    """Patch raw ASGI headers in place, like `patch_cache_control_directives()`.
+
+    This skips building a `MutableHeaders` for responses that are only patched.
+    """
+    index: int | None = None
+    cache_control = ""
+    for i, (key, value) in enumerate(raw_headers):
+        if key == b"cache-control":
+            index = i
+            cache_control = value.decode("latin-1")
+            break
+
+    patched_cache_control = merge_cache_control(cache_control, directives)
+
+    if index is None:
+        if patched_cache_control:
+            raw_headers.append(
+                (b"cache-control", patched_cache_control.encode("latin-1"))
+            )
+        return
+
+    # Only keep the first Cache-Control header, as `MutableHeaders` would.
+    raw_headers[index + 1 :] = [
+        item for item in raw_headers[index + 1 :] if item[0] != b"cache-control"
+    ]
+    if patched_cache_control:
+        raw_headers[index] = (b"cache-control", patched_cache_control.encode("latin-1"))
+    else:
+        del raw_headers[index]
 
-    if "max-age" in cache_control and "max_age" in kwargs:
-        kwargs["max_age"] = min(int(cache_control["max-age"]), kwargs["max_age"])
 
-    if "public" in kwargs:
+def merge_cache_control(
+    cache_control: str, directives: Mapping[str, typing.Any]
+) -> str:
+    """Return a Cache-Control header value extended with the given directives."""
+    fields = dict(parse_cache_control(cache_control))
+
+    if "public" in directives:
         raise NotImplementedError(
             "The 'public' cache control directive isn't supported yet."
         )
 
-    if "private" in kwargs:
+    if "private" in directives:
         raise NotImplementedError(
             "The 'private' cache control directive isn't supported yet."
         )
 
-    for key, value in kwargs.items():
-        key = key.replace("_", "-")
-        cache_control[key] = value
+    if "max-age" in fields and "max-age" in directives:
+        max_age = min(int(fields["max-age"]), directives["max-age"])
+        directives = {**directives, "max-age": max_age}
+
+    fields.update(directives)
 
-    directives: list[str] = []
-    for key, value in cache_control.items():
+    rendered: list[str] = []
+    for key, value in fields.items():
         if value is False:
             continue
         if value is True:
-            directives.append(key)
+            rendered.append(key)
         else:
-            directives.append(f"{key}={value}")
+            rendered.append(f"{key}={value}")
 
-    patched_cache_control = ", ".join(directives)
+    return ", ".join(rendered)
 
-    if patched_cache_control:
-        headers["Cache-Control"] = patched_cache_control
-    else:
-        del headers["Cache-Control"]
+
+# Responses from the same endpoint usually repeat the same header values, so the
+# parsed forms are kept in small LRU caches.
+@functools.lru_cache(maxsize=64)
+def parse_cache_control(cache_control: str) -> tuple[tuple[str, str | bool], ...]:
+    """Parse a Cache-Control header value into `(directive, value)` pairs.
+
+    Directives without a value, like `no-cache`, have a value of `True`.
+    """
+    fields: dict[str, str | bool] = {}
+    for field in parse_http_list(cache_control):
+        try:
+            key, value = field.split("=")
+        except ValueError:  # noqa: PERF203
+            fields[field] = True
+        else:
+            fields[key] = value
+    return tuple(fields.items())
+
+
+@functools.lru_cache(maxsize=64)
+def parse_vary(vary: str) -> frozenset[str]:
+    """Parse a Vary header value into lowercased header names."""
+    return frozenset(header.lower() for header in parse_http_list(vary))
@@ -1,4 +1,6 @@
 # noqa: A005
+from __future__ import annotations
+
 import logging
 import os
 import sys
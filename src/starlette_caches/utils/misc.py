@@ -1,9 +1,13 @@
 """Miscellaneous utilities and helper functions."""
 
+from __future__ import annotations
+
 import base64
 import email.utils
+import functools
 import inspect
 import typing
+import weakref
 
 TFunc = typing.TypeVar("TFunc", bound=typing.Callable[..., typing.Any])
 
@@ -13,7 +17,14 @@ def http_date(epoch_time: float) -> str:
 
     See: https://tools.ietf.org/html/rfc7231#section-7.1.1.2
     """
-    return email.utils.formatdate(epoch_time, usegmt=True)
+    # HTTP dates have a resolution of one second, so responses sent within the same
+    # second can share the formatted value.
+    return _http_date(int(epoch_time))
+
+
+@functools.lru_cache(maxsize=16)
+def _http_date(epoch_seconds: int) -> str:
+    return email.utils.formatdate(epoch_seconds, usegmt=True)
 
 
 def bytes_to_json_string(data: bytes) -> str:
@@ -25,7 +36,9 @@ def bytes_to_json_string(data: bytes) -> str:
     # NOTE: we can't just return 'data.decode()', because that won't work
     # if 'data' is not in a given encoding (e.g. utf-8), as is the case
     # when e.g. 'data' is gzip-compressed.
-    return base64.encodebytes(data).decode("ascii")
+    # NOTE: 'b64encode()' is used rather than 'encodebytes()', which also splits the
+    # output into lines, copying it once more for large bodies.
+    return base64.b64encode(data).decode("ascii")
 
 
 def json_string_to_bytes(value: str) -> bytes:
@@ -34,7 +47,8 @@ def json_string_to_bytes(value: str) -> bytes:
     Given a previously-computed JSON-compatible string representation of
     binary data, return the original binary data.
     """
-    return base64.decodebytes(value.encode("ascii"))
+    # Newlines from values encoded with 'encodebytes()' are discarded.
+    return base64.b64decode(value)
 
 
 def has_asgi3_signature(func: typing.Callable) -> bool:
@@ -43,8 +57,25 @@ def has_asgi3_signature(func: typing.Callable) -> bool:
     return own_parameters == {"scope", "receive", "send"}
 
 
+# Results of `is_asgi3()` for functions and classes, which don't change once defined.
+_is_asgi3_cache: weakref.WeakKeyDictionary[typing.Any, bool] = (
+    weakref.WeakKeyDictionary()
+)
+
+
 def is_asgi3(app: typing.Any) -> bool:
     """Return whether 'app' corresponds to an ASGI3 callable."""
+    if not (inspect.isclass(app) or inspect.isfunction(app)):
+        return _is_asgi3(app)
+
+    try:
+        return _is_asgi3_cache[app]
+    except KeyError:
+        result = _is_asgi3_cache[app] = _is_asgi3(app)
+        return result
+
+
+def _is_asgi3(app: typing.Any) -> bool:
     if inspect.isclass(app):
         constructor = app.__init__  # type: ignore
         return has_asgi3_signature(constructor) and hasattr(app, "__await__")
@@ -10,7 +10,10 @@ from starlette.responses import PlainTextResponse
 from starlette.routing import Mount
 from starlette.testclient import TestClient
 
-from starlette_caches.middleware import CacheControlMiddleware
+from starlette_caches.middleware import CacheControlMiddleware, CacheControlResponder
+
+if typing.TYPE_CHECKING:
+    from starlette.types import Receive, Scope, Send
 
 
 @pytest.mark.parametrize(
@@ -105,3 +108,36 @@ def test_not_http() -> None:
     with TestClient(app):
         assert lifespan_state == "started"
     assert lifespan_state == "stopped"
+
+
+def test_duplicate_cache_control_headers() -> None:
+    async def app(scope: Scope, receive: Receive, send: Send) -> None:
+        await send(
+            {
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"cache-control", b"max-age=60"),
+                    (b"content-type", b"text/plain"),
+                    (b"cache-control", b"no-transform"),
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"Hello, world!"})
+
+    client = TestClient(CacheControlMiddleware(app, max_age=30))
+
+    r = client.get("/")
+    assert r.status_code == 200
+    assert r.headers.get_list("Cache-Control") == ["max-age=30"]
+    assert r.headers["Content-Type"] == "text/plain"
+
+
+def test_cache_control_responder_kwargs() -> None:
+    app = PlainTextResponse("Hello, world!")
+
+    client = TestClient(CacheControlResponder(app, max_age=30, must_revalidate=True))
+
+    r = client.get("/")
+    assert r.status_code == 200
+    assert r.headers["Cache-Control"] == "max-age=30, must-revalidate"
@@ -1,10 +1,12 @@
 from __future__ import annotations
 
+import asyncio
 import contextlib
 import datetime as dt
 import re
 import typing
 from functools import partial
+from unittest import mock
 
 import pytest
 from aiocache import Cache
@@ -16,10 +18,12 @@ from starlette.middleware.gzip import GZipMiddleware
 from starlette.responses import PlainTextResponse, Response, StreamingResponse
 from starlette.routing import Route
 
+from starlette_caches import middleware
 from starlette_caches.exceptions import DuplicateCaching
 from starlette_caches.middleware import CacheMiddleware
 from starlette_caches.rules import Rule
-from tests.utils import ComparableHTTPXResponse
+from starlette_caches.utils import cache as cache_utils
+from tests.utils import ComparableHTTPXResponse, asgi_client
 
 if typing.TYPE_CHECKING:
     from starlette.requests import Request
@@ -62,6 +66,61 @@ def test_cache_response() -> None:
         assert ComparableHTTPXResponse(r2) == r
 
 
+def test_cache_key_computed_once_per_request() -> None:
+    cache = Cache()
+
+    async def route(request: Request) -> Response:
+        return PlainTextResponse("Hello, world!", headers={"Vary": "Accept-Encoding"})
+
+    app = Starlette(
+        routes=[Route("/", route)],
+        middleware=[Middleware(CacheMiddleware, cache=cache)],
+    )
+
+    url_patch = mock.patch.object(cache_utils, "hash_url", wraps=cache_utils.hash_url)
+    vary_patch = mock.patch.object(
+        cache_utils,
+        "generate_varying_headers_cache_key",
+        wraps=cache_utils.generate_varying_headers_cache_key,
+    )
+
+    with TestClient(app) as client, url_patch as hash_url, vary_patch as vary_key:
+        # The last request looks up the known varying headers, misses, then stores
+        # its own response.
+        for accept_encoding, expected in [
+            ("gzip", "miss"),
+            ("gzip", "hit"),
+            ("identity", "miss"),
+        ]:
+            hash_url.reset_mock()
+            vary_key.reset_mock()
+
+            r = client.get("/", headers={"Accept-Encoding": accept_encoding})
+            assert r.headers["X-Cache"] == expected
+            assert hash_url.call_count == 1
+            assert vary_key.call_count == 1
+
+
+def test_cache_hit_replays_stored_response() -> None:
+    cache = Cache()
+
+    app = Starlette(
+        routes=[Route("/", standard_route)],
+        middleware=[Middleware(CacheMiddleware, cache=cache)],
+    )
+
+    with TestClient(app) as client:
+        r = client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+
+        with mock.patch.object(Response, "__call__") as response_call:
+            r1 = client.get("/")
+        assert r1.headers["X-Cache"] == "hit"
+        assert r1.text == "Hello, world!"
+        assert r1.headers["Content-Length"] == str(len("Hello, world!"))
+        response_call.assert_not_called()
+
+
 def test_not_http() -> None:
     lifespan_state = None
 
@@ -105,6 +164,26 @@ def test_non_cachable_request() -> None:
         assert ComparableHTTPXResponse(r1) == r
 
 
+@pytest.mark.parametrize("method", ["POST", "PUT", "PATCH", "DELETE", "OPTIONS"])
+def test_non_cachable_request_skips_cache(method: str) -> None:
+    cache = Cache()
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", standard_route, methods=[method])]), cache=cache
+    )
+    get = mock.patch.object(cache, "get", wraps=cache.get)
+    set_ = mock.patch.object(cache, "set", wraps=cache.set)
+
+    with TestClient(app) as client, get as get_mock, set_ as set_mock:
+        r = client.request(method, "/")
+        assert r.status_code == 200
+        assert "X-Cache" not in r.headers
+
+    set_mock.assert_not_called()
+    # Invalidating methods only look up the varying headers stored for the URL, to
+    # find the cached responses to delete.
+    assert get_mock.call_count == (1 if method != "OPTIONS" else 0)
+
+
 @pytest.mark.parametrize(
     ("path", "match_path"),
     [
@@ -309,6 +388,36 @@ def test_streaming_response() -> None:
         assert "X-Cache" not in r.headers
 
 
+def test_oversize_not_cached() -> None:
+    cache = Cache()
+    body = "x" * (2 * 1024 * 1024)
+
+    async def large_route(request: Request) -> Response:
+        return PlainTextResponse(body)
+
+    async def small_route(request: Request) -> Response:
+        return PlainTextResponse("Hello, world!")
+
+    app = Starlette(
+        routes=[Route("/large", large_route), Route("/small", small_route)],
+        middleware=[
+            Middleware(CacheMiddleware, cache=cache, max_cacheable_bytes=1024 * 1024)
+        ],
+    )
+
+    with TestClient(app) as client:
+        for _ in range(2):
+            r = client.get("/large")
+            assert r.status_code == 200
+            assert r.text == body
+            assert "X-Cache" not in r.headers
+
+        r = client.get("/small")
+        assert r.headers["X-Cache"] == "miss"
+        r = client.get("/small")
+        assert r.headers["X-Cache"] == "hit"
+
+
 def test_vary() -> None:
     """
     Sending different values for request headers registered as varying should
@@ -404,3 +513,280 @@ def test_duplicate_caching() -> None:
 
     with TestClient(app) as client, pytest.raises(DuplicateCaching):
         client.get("/duplicate_cache")
+
+
+@pytest.mark.asyncio
+async def test_rules_match_raw_path() -> None:
+    # An encoded "?" is part of the path, which the request URL doesn't preserve.
+    app = CacheMiddleware(
+        PlainTextResponse("Hello, world!"), cache=Cache(), rules=[Rule(match="/a?b")]
+    )
+
+    async with asgi_client(app) as client:
+        r = await client.get("/a%3Fb")
+        assert r.status_code == 200
+        assert r.headers["X-Cache"] == "miss"
+
+        r1 = await client.get("/a%3Fb")
+        assert r1.headers["X-Cache"] == "hit"
+
+
+@pytest.mark.asyncio
+async def test_separate_request_is_not_duplicate_caching() -> None:
+    # Only a middleware wrapping another one for the same request is duplicate
+    # caching. A cached application may itself make requests to another cached
+    # application, in the same task.
+    inner_app = CacheMiddleware(
+        Starlette(routes=[Route("/", standard_route)]), cache=Cache()
+    )
+
+    async def proxy_route(request: Request) -> Response:
+        async with asgi_client(inner_app) as client:
+            r = await client.get("/")
+        return PlainTextResponse(r.text)
+
+    app = CacheMiddleware(Starlette(routes=[Route("/", proxy_route)]), cache=Cache())
+
+    async with asgi_client(app) as client:
+        responses = await asyncio.gather(*(client.get("/") for _ in range(5)))
+
+    for r in responses:
+        assert r.status_code == 200
+        assert r.text == "Hello, world!"
+
+
+@pytest.mark.asyncio
+async def test_background_write() -> None:
+    cache = Cache()
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", standard_route)]),
+        cache=cache,
+        background_write=True,
+    )
+    assert app.background_writes is not None
+
+    async with asgi_client(app) as client:
+        r = await client.get("/")
+        assert r.status_code == 200
+        assert r.text == "Hello, world!"
+        assert r.headers["X-Cache"] == "miss"
+        assert r.headers["Cache-Control"] == "max-age=31536000"
+
+        await asyncio.gather(*app.background_writes)
+
+        r1 = await client.get("/")
+        assert r1.headers["X-Cache"] == "hit"
+        assert r1.text == "Hello, world!"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("background_write", [False, True])
+async def test_learnt_vary_sent_to_client(background_write: bool) -> None:  # noqa: FBT001
+    first = True
+
+    async def route(request: Request) -> Response:
+        # Only the first response varies.
+        nonlocal first
+        headers = {"Vary": "Accept-Encoding"} if first else {}
+        first = False
+        return PlainTextResponse("Hello, world!", headers=headers)
+
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", route)]),
+        cache=Cache(),
+        background_write=background_write,
+    )
+
+    async with asgi_client(app) as client:
+        r = await client.get("/", headers={"Accept-Encoding": "gzip"})
+        assert r.headers["X-Cache"] == "miss"
+        assert r.headers["Vary"].lower() == "accept-encoding"
+        if app.background_writes is not None:
+            await asyncio.gather(*app.background_writes)
+
+        r1 = await client.get("/", headers={"Accept-Encoding": "identity"})
+        assert r1.headers["X-Cache"] == "miss"
+        assert r1.headers["Vary"].lower() == "accept-encoding"
+        if app.background_writes is not None:
+            await asyncio.gather(*app.background_writes)
+
+        r2 = await client.get("/", headers={"Accept-Encoding": "identity"})
+        assert r2.headers["X-Cache"] == "hit"
+        assert r2.headers["Vary"].lower() == "accept-encoding"
+
+
+@pytest.mark.asyncio
+async def test_background_write_limit() -> None:
+    cache = Cache()
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", standard_route)]),
+        cache=cache,
+        background_write=True,
+    )
+
+    async with asgi_client(app) as client:
+        with mock.patch.object(middleware, "MAX_BACKGROUND_WRITES", 0):
+            r = await client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+        assert not app.background_writes
+
+        r1 = await client.get("/")
+        assert r1.headers["X-Cache"] == "miss"
+
+
+@pytest.mark.asyncio
+async def test_background_write_error() -> None:
+    cache = Cache()
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", standard_route)]),
+        cache=cache,
+        background_write=True,
+    )
+    assert app.background_writes is not None
+
+    async with asgi_client(app) as client:
+        with mock.patch.object(cache, "set", side_effect=ConnectionError):
+            r = await client.get("/")
+            await asyncio.gather(*app.background_writes)
+        assert r.status_code == 200
+        assert r.headers["X-Cache"] == "miss"
+
+        r1 = await client.get("/")
+        assert r1.headers["X-Cache"] == "miss"
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("background_write", [False, True])
+async def test_no_stampede(background_write: bool) -> None:  # noqa: FBT001
+    calls = 0
+
+    async def counting_route(request: Request) -> Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return PlainTextResponse("Hello, world!")
+
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", counting_route)]),
+        cache=Cache(),
+        background_write=background_write,
+        coalesce_misses=True,
+    )
+
+    async with asgi_client(app) as client:
+        responses = await asyncio.gather(*(client.get("/") for _ in range(50)))
+
+    assert calls == 1
+    assert all(r.text == "Hello, world!" for r in responses)
+    assert sorted(r.headers["X-Cache"] for r in responses) == ["hit"] * 49 + ["miss"]
+    assert not app.pending_responses
+
+
+@pytest.mark.asyncio
+async def test_no_stampede_not_cachable() -> None:
+    calls = 0
+
+    async def counting_route(request: Request) -> Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return PlainTextResponse("Hello, world!", status_code=500)
+
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", counting_route)]),
+        cache=Cache(),
+        coalesce_misses=True,
+    )
+
+    async with asgi_client(app) as client:
+        responses = await asyncio.gather(*(client.get("/") for _ in range(5)))
+
+    # Requests waiting for an uncachable response compute their own.
+    assert calls == 5
+    assert all(r.status_code == 500 for r in responses)
+    assert not app.pending_responses
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_not_coalesced_by_default() -> None:
+    calls = 0
+
+    async def counting_route(request: Request) -> Response:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return PlainTextResponse("Hello, world!")
+
+    app = CacheMiddleware(Starlette(routes=[Route("/", counting_route)]), cache=Cache())
+    assert app.pending_responses is None
+
+    async with asgi_client(app) as client:
+        responses = await asyncio.gather(*(client.get("/") for _ in range(5)))
+
+    assert calls == 5
+    assert all(r.headers["X-Cache"] == "miss" for r in responses)
+
+
+@pytest.mark.asyncio
+async def test_coalesced_miss_wait_is_bounded() -> None:
+    first = asyncio.Event()
+    release = asyncio.Event()
+
+    async def route(request: Request) -> Response:
+        if not first.is_set():
+            # The first request hangs until the test is done with it.
+            first.set()
+            await release.wait()
+        return PlainTextResponse("Hello, world!")
+
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", route)]), cache=Cache(), coalesce_misses=True
+    )
+
+    async with asgi_client(app) as client:
+        hanging = asyncio.ensure_future(client.get("/"))
+        await first.wait()
+        with mock.patch.object(middleware, "MAX_PENDING_RESPONSE_WAIT", 0.01):
+            r = await client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+        assert not hanging.done()
+
+        release.set()
+        r1 = await hanging
+        assert r1.headers["X-Cache"] == "miss"
+    assert not app.pending_responses
+
+
+@pytest.mark.asyncio
+async def test_coalesced_misses_by_variant() -> None:
+    running = 0
+    max_running = 0
+
+    async def route(request: Request) -> Response:
+        nonlocal running, max_running
+        running += 1
+        max_running = max(max_running, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return PlainTextResponse("Hello, world!", headers={"Vary": "Accept-Encoding"})
+
+    app = CacheMiddleware(
+        Starlette(routes=[Route("/", route)]), cache=Cache(), coalesce_misses=True
+    )
+
+    async with asgi_client(app) as client:
+        # Learn that responses vary on Accept-Encoding.
+        r = await client.get("/", headers={"Accept-Encoding": "br"})
+        assert r.headers["X-Cache"] == "miss"
+
+        responses = await asyncio.gather(
+            *(
+                client.get("/", headers={"Accept-Encoding": accept_encoding})
+                for accept_encoding in ["gzip", "identity"] * 5
+            )
+        )
+
+    # Each variant is computed once, and variants don't wait for each other.
+    assert max_running == 2
+    assert sorted(r.headers["X-Cache"] for r in responses) == ["hit"] * 8 + ["miss"] * 2
+    assert not app.pending_responses
@@ -5,6 +5,7 @@ import math
 import typing
 
 import pytest
+from aiocache import BaseCache
 from starlette.testclient import TestClient
 
 from .utils import cleanup_new_imports
@@ -18,19 +19,29 @@ EXAMPLES = [
 ]
 
 
-@pytest.fixture(name="app", params=EXAMPLES)
-def fixture_app(request: pytest.FixtureRequest) -> typing.Iterator[ASGIApp]:
+# The example application and its client are shared by the tests of a module, with
+# caches cleared before each test.
+@pytest.fixture(name="example", params=EXAMPLES, scope="module")
+def fixture_example(request: pytest.FixtureRequest) -> typing.Iterator[typing.Any]:
     with cleanup_new_imports():
-        module: typing.Any = importlib.import_module(request.param)
-        yield module.app
+        yield importlib.import_module(request.param)
 
 
-@pytest.fixture(name="client")
-def fixture_client(app: ASGIApp) -> typing.Iterator[TestClient]:
+@pytest.fixture(name="client", scope="module")
+def fixture_client(example: typing.Any) -> typing.Iterator[TestClient]:
+    app: ASGIApp = example.app
     with TestClient(app) as client:
         yield client
 
 
+@pytest.fixture(autouse=True)
+def fixture_clear_caches(example: typing.Any, client: TestClient) -> None:
+    assert client.portal is not None
+    for value in vars(example).values():
+        if isinstance(value, BaseCache):
+            client.portal.call(value.clear)
+
+
 def test_caching(client: TestClient) -> None:
     r = client.get("/")
     assert r.status_code == 200
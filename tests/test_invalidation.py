@@ -2,10 +2,20 @@ import importlib
 import typing
 
 import pytest
+from aiocache import Cache
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
 from starlette.testclient import TestClient
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from .utils import cleanup_new_imports
+from starlette_caches.helpers import CacheHelper
+from starlette_caches.middleware import CacheMiddleware, CacheResponder
+from starlette_caches.rules import Rule
+
+from .utils import asgi_client, cleanup_new_imports
 
 EXAMPLES = [
     pytest.param("tests.examples.invalidation.fastapi", id="fastapi"),
@@ -68,3 +78,62 @@ def test_response_invalidation_noop(client: TestClient) -> None:
     assert r.status_code == 200
     assert r.text == "Hello, GET!"
     assert r.headers["X-Cache"] == "miss"
+
+
+def test_response_manual_invalidation_with_headers() -> None:
+    async def home(request: Request) -> Response:
+        return PlainTextResponse("Hello, GET!", headers={"Vary": "Accept-Language"})
+
+    async def invalidate(request: Request) -> Response:
+        helper = CacheHelper(request)
+        await helper.invalidate_cache_for("home", headers={"Accept-Language": "fr"})
+        return Response(status_code=204)
+
+    app = Starlette(
+        routes=[
+            Route("/", home, name="home"),
+            Route("/invalidate", invalidate, methods=["POST"]),
+        ],
+        middleware=[Middleware(CacheMiddleware, cache=Cache())],
+    )
+
+    with TestClient(app, headers={"Accept-Language": "fr"}) as client:
+        r = client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+
+        r = client.get("/")
+        assert r.headers["X-Cache"] == "hit"
+
+        r = client.post("/invalidate")
+        assert r.status_code == 204, r.text
+
+        r = client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+
+
+@pytest.mark.asyncio
+async def test_cache_responder_invalidation() -> None:
+    # The responder may be used without `CacheMiddleware`.
+    async def home(request: Request) -> Response:
+        return PlainTextResponse(f"Hello, {request.method}!")
+
+    app = Starlette(routes=[Route("/", home, methods=["GET", "POST"])])
+    cache = Cache()
+
+    async def responder(scope: Scope, receive: Receive, send: Send) -> None:
+        await CacheResponder(app, cache=cache, rules=[Rule()])(scope, receive, send)
+
+    async with asgi_client(responder) as client:
+        r = await client.get("/")
+        assert r.headers["X-Cache"] == "miss"
+
+        r = await client.get("/")
+        assert r.headers["X-Cache"] == "hit"
+
+        r = await client.post("/")
+        assert r.status_code == 200
+        assert r.text == "Hello, POST!"
+        assert "X-Cache" not in r.headers
+
+        r = await client.get("/")
+        assert r.headers["X-Cache"] == "miss"
@@ -8,6 +8,7 @@ from starlette.requests import Request
 from starlette.responses import Response
 
 from starlette_caches.rules import (
+    CompiledRules,
     Rule,
     get_rule_matching_request,
     get_rule_matching_response,
@@ -83,3 +84,177 @@ def test_get_rule_matching_response() -> None:
     assert rule is not None
     assert rule.match == "/test2"
     assert rule.status == 404
+
+
+def test_get_rule_matching_no_match() -> None:
+    rules = [Rule(match="/test1", status=200)]
+    request = mock_request("/test2")
+    response = Response(status_code=200)
+    assert get_rule_matching_request(rules, request=request) is None
+    assert get_rule_matching_response(rules, request=request, response=response) is None
+
+
+def test_rule_match_iterable_is_normalized_once() -> None:
+    paths: list[str | re.Pattern] = ["/test1", re.compile(r"^/test2")]
+    rule = Rule(match=(path for path in paths))
+    assert request_matches_rule(rule, request=mock_request("/test1"))
+    assert request_matches_rule(rule, request=mock_request("/test2/sub"))
+    assert not request_matches_rule(rule, request=mock_request("/other"))
+
+
+def test_response_matches_rule_with_status_collection() -> None:
+    rule = Rule(status=[200, 404])
+    request = mock_request("/test")
+    assert response_matches_rule(rule, request=request, response=Response())
+    assert response_matches_rule(
+        rule, request=request, response=Response(status_code=404)
+    )
+    assert not response_matches_rule(
+        rule, request=request, response=Response(status_code=500)
+    )
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/a.b", True),
+        ("/axb", False),
+        ("/a.b/sub", False),
+        ("/regex/sub", True),
+        ("/other", False),
+    ],
+)
+def test_rule_mixed_match_types(path: str, expected: bool) -> None:  # noqa: FBT001
+    # Strings are matched exactly, never as regular expressions or prefixes.
+    rule = Rule(match=["/a.b", re.compile(r"^/regex/")])
+    assert rule.matches_path(path) is expected
+    compiled = CompiledRules([rule])
+    assert (compiled.match_request(path) is rule) is expected
+
+
+def test_rule_status_iterable_is_normalized_once() -> None:
+    rule = Rule(status=(code for code in (200, 301)))
+    assert rule.status == (200, 301)
+    assert rule.matches_status(200)
+    assert rule.matches_status(301)
+    assert not rule.matches_status(404)
+
+    # An empty collection matches no status, unlike the default of any status.
+    assert not Rule(status=[]).matches_status(200)
+    assert Rule().matches_status(200)
+
+
+def test_rule_is_hashable() -> None:
+    rule = Rule(match=["/test1", "/test2"], status=[200, 404])
+    assert rule.match == ("/test1", "/test2")
+    assert rule.status == (200, 404)
+    assert rule == Rule(match=("/test1", "/test2"), status=(200, 404))
+    assert {rule: 1}[Rule(match=("/test1", "/test2"), status=(200, 404))] == 1
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/a", 0),
+        ("/A", 1),
+        ("/b", 2),
+        ("/bb", 2),
+        ("/c", 2),
+        ("/e", 3),
+        ("/d", None),
+    ],
+)
+def test_compiled_rules_combined_regex_in_order(
+    path: str, expected: int | None
+) -> None:
+    rules = [
+        Rule(match=re.compile(r"/a$")),
+        # Patterns with flags or groups of their own are matched separately.
+        Rule(match=re.compile(r"/a", re.IGNORECASE)),
+        Rule(match=[re.compile(r"/(b)"), re.compile(r"/b|/c")]),
+        Rule(match=re.compile(r"/c|/e")),
+    ]
+    compiled = CompiledRules(rules)
+    rule = compiled.match_request(path)
+    assert rule is (None if expected is None else rules[expected])
+
+
+@pytest.mark.parametrize(
+    ("path", "expected"),
+    [
+        ("/literal", 0),
+        ("/regex/sub", 1),
+        ("/regex", 1),
+        ("/both", 1),
+        ("/other", 3),
+    ],
+)
+def test_compiled_rules_match_request_in_order(path: str, expected: int) -> None:
+    rules = [
+        Rule(match="/literal"),
+        Rule(match=re.compile(r"^/(regex|both)")),
+        Rule(match=["/both", "/regex"]),
+        Rule(),
+    ]
+    request = mock_request(path)
+    assert get_rule_matching_request(rules, request=request) is rules[expected]
+    compiled = CompiledRules(rules)
+    assert get_rule_matching_request(compiled, request=request) is rules[expected]
+
+
+@pytest.mark.parametrize(
+    ("path", "status_code", "expected"),
+    [
+        ("/test", 200, 0),
+        ("/test", 404, 1),
+        ("/test", 500, 2),
+        ("/other", 200, 2),
+        ("/other", 404, 1),
+    ],
+)
+def test_compiled_rules_match_response_in_order(
+    path: str, status_code: int, expected: int
+) -> None:
+    rules = [
+        Rule(match="/test", status=200),
+        Rule(match=re.compile(r"^/"), status=404),
+        Rule(),
+    ]
+    request = mock_request(path)
+    response = Response(status_code=status_code)
+    compiled = CompiledRules(rules)
+    for candidates in rules, compiled:
+        rule = get_rule_matching_response(
+            candidates, request=request, response=response
+        )
+        assert rule is rules[expected]
+
+
+def test_compiled_rules_no_match() -> None:
+    rules = CompiledRules([Rule(match="/test")])
+    assert len(rules) == 1
+    assert rules[0] == Rule(match="/test")
+    assert get_rule_matching_request(rules, request=mock_request("/other")) is None
+    assert (
+        get_rule_matching_response(
+            rules, request=mock_request("/other"), response=Response()
+        )
+        is None
+    )
+
+
+def test_compiled_rules_match_like_rule_list() -> None:
+    rules = [
+        *(Rule(match=f"/page/{i}", status=200 + i % 2) for i in range(50)),
+        *(Rule(match=re.compile(rf"^/api/v{i}/"), status=200) for i in range(50)),
+        Rule(match=re.compile(r"^/API/", re.IGNORECASE), status=404),
+        Rule(match=[re.compile(r"^/page/"), "/api/v1/"], ttl=10),
+    ]
+    compiled = CompiledRules(rules)
+    for path in "/page/3", "/page/4", "/page/99", "/api/v1/", "/api/V2/x", "/other":
+        request = mock_request(path)
+        for status_code in 200, 201, 404:
+            response = Response(status_code=status_code)
+            assert get_rule_matching_response(
+                compiled, request=request, response=response
+            ) is get_rule_matching_response(rules, request=request, response=response)
@@ -1,21 +1,38 @@
 from __future__ import annotations
 
+import asyncio
 import datetime as dt
+import pickle
+import sys
 import typing
+from unittest import mock
 
 import pytest
 import pytest_asyncio
-from aiocache import BaseCache, Cache
+from aiocache import BaseCache, Cache, SimpleMemoryCache
+from aiocache.serializers import (
+    BaseSerializer,
+    JsonSerializer,
+    NullSerializer,
+    PickleSerializer,
+)
+from starlette.datastructures import URL, Headers, MutableHeaders
 from starlette.requests import Request
-from starlette.responses import PlainTextResponse
+from starlette.responses import PlainTextResponse, Response
 
 from starlette_caches.exceptions import RequestNotCachable, ResponseNotCachable
 from starlette_caches.rules import Rule
+from starlette_caches.utils import cache as cache_utils
 from starlette_caches.utils.cache import (
     deserialize_response,
+    generate_cache_key,
     get_cache_key,
     get_from_cache,
+    get_request_cache_key,
+    pack_response,
+    patch_cache_control,
     store_in_cache,
+    unpack_response,
 )
 from tests.utils import ComparableStarletteResponse
 
@@ -31,6 +48,18 @@ async def fixture_cache() -> typing.AsyncIterator[BaseCache]:
         yield cache
 
 
+class SyncExistsCache(SimpleMemoryCache):
+    def exists_sync(self, key: str) -> bool:
+        return key in self._cache
+
+
+@pytest_asyncio.fixture(name="sync_exists_cache")
+async def fixture_sync_exists_cache() -> typing.AsyncIterator[SyncExistsCache]:
+    # A namespace checks that `exists_sync()` receives the keys as stored.
+    async with SyncExistsCache(namespace="test") as cache:
+        yield cache
+
+
 @pytest_asyncio.fixture(name="short_cache")
 async def fixture_short_cache() -> typing.AsyncIterator[BaseCache]:
     async with Cache(ttl=2 * 60) as cache:
@@ -65,6 +94,18 @@ async def test_non_cachable_methods(cache: BaseCache, method: str) -> None:
         await get_from_cache(request, cache=cache, rules=[Rule()])
 
 
+async def test_get_from_cache_no_matching_rule(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [],
+    }
+    request = Request(scope)
+    with pytest.raises(RequestNotCachable):
+        await get_from_cache(request, cache=cache, rules=[Rule(match="/other")])
+
+
 async def test_store_in_cache(cache: BaseCache) -> None:
     scope: Scope = {
         "type": "http",
@@ -217,6 +258,108 @@ async def test_get_from_cache_head(cache: BaseCache) -> None:
     assert ComparableStarletteResponse(cached_response) == response
 
 
+async def test_store_head_response_keeps_get_response(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [],
+    }
+    get_request = Request(scope)
+    head_request = Request({**scope, "method": "HEAD"})
+    response = PlainTextResponse("Hello, world!")
+    await store_in_cache(response, request=get_request, cache=cache, rules=[Rule()])
+
+    head_response = PlainTextResponse("")
+    await store_in_cache(
+        head_response, request=head_request, cache=cache, rules=[Rule()]
+    )
+
+    cached_response = await get_from_cache(get_request, cache=cache, rules=[Rule()])
+    assert cached_response is not None
+    assert cached_response.body == b"Hello, world!"
+
+
+async def test_get_from_cache_stripped_head_response(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "HEAD",
+        "path": "/path",
+        "headers": [],
+    }
+    head_request = Request(scope)
+    get_request = Request({**scope, "method": "GET"})
+    # The application left out the body, but kept its length.
+    response = Response(headers={"Content-Length": "13"})
+    await store_in_cache(response, request=head_request, cache=cache, rules=[Rule()])
+
+    assert await get_from_cache(head_request, cache=cache, rules=[Rule()]) is not None
+    assert await get_from_cache(get_request, cache=cache, rules=[Rule()]) is None
+
+    response = PlainTextResponse("Hello, world!")
+    await store_in_cache(response, request=get_request, cache=cache, rules=[Rule()])
+    cached_response = await get_from_cache(get_request, cache=cache, rules=[Rule()])
+    assert cached_response is not None
+    assert cached_response.body == b"Hello, world!"
+
+
+@pytest.mark.parametrize(
+    "serializer",
+    [
+        pytest.param(NullSerializer(), id="null"),
+        pytest.param(PickleSerializer(), id="pickle"),
+        pytest.param(JsonSerializer(), id="json"),
+    ],
+)
+async def test_get_from_cache_serializers(serializer: BaseSerializer) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [],
+    }
+    request = Request(scope)
+    response = PlainTextResponse("Hello, world!", headers={"Vary": "Accept"})
+
+    async with Cache(serializer=serializer) as cache:
+        await store_in_cache(response, request=request, cache=cache, rules=[Rule()])
+        cached_response = await get_from_cache(request, cache=cache, rules=[Rule()])
+
+    assert cached_response is not None
+    assert cached_response.headers["x-cache"] == "hit"
+    del response.headers["x-cache"]
+    del cached_response.headers["x-cache"]
+    assert ComparableStarletteResponse(cached_response) == response
+
+
+async def test_pack_response_pickle_round_trip() -> None:
+    response = PlainTextResponse("Hello, world!", status_code=404)
+    packed_response = pack_response(response)
+    assert pickle.loads(pickle.dumps(packed_response, 5)) == packed_response  # noqa: S301
+
+    unpacked_response = unpack_response(packed_response)
+    assert ComparableStarletteResponse(unpacked_response) == response
+    # The unpacked response can be modified without affecting the packed one.
+    unpacked_response.headers["X-Cache"] = "hit"
+    assert unpack_response(packed_response).raw_headers == response.raw_headers
+
+
+async def test_get_from_cache_empty_response(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [],
+    }
+    request = Request(scope)
+    await store_in_cache(
+        Response(status_code=204), request=request, cache=cache, rules=[Rule()]
+    )
+    cached_response = await get_from_cache(request, cache=cache, rules=[Rule()])
+    assert cached_response is not None
+    assert cached_response.status_code == 204
+
+
 async def test_get_from_cache_different_path(cache: BaseCache) -> None:
     scope: Scope = {
         "type": "http",
@@ -253,3 +396,250 @@ async def test_get_from_cache_vary(cache: BaseCache) -> None:
     other_request = Request(other_scope)
     cached_response = await get_from_cache(other_request, cache=cache, rules=[Rule()])
     assert cached_response is None
+
+
+async def test_get_from_cache_exists_sync(sync_exists_cache: SyncExistsCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [],
+    }
+    request = Request(scope)
+
+    get = mock.patch.object(sync_exists_cache, "get")
+    multi_get = mock.patch.object(sync_exists_cache, "multi_get")
+    with get as get_mock, multi_get as multi_get_mock:
+        cached_response = await get_from_cache(
+            request, cache=sync_exists_cache, rules=[Rule()]
+        )
+        assert cached_response is None
+    get_mock.assert_not_called()
+    multi_get_mock.assert_not_called()
+
+    response = PlainTextResponse("Hello, world!")
+    await store_in_cache(
+        response, request=request, cache=sync_exists_cache, rules=[Rule()]
+    )
+    cached_response = await get_from_cache(
+        request, cache=sync_exists_cache, rules=[Rule()]
+    )
+    assert cached_response is not None
+    assert cached_response.body == b"Hello, world!"
+
+
+async def test_get_from_cache_fetches_varying_headers_once(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "HEAD",
+        "path": "/path",
+        "headers": [],
+    }
+    request = Request(scope)
+    response = PlainTextResponse("Hello, world!")
+    await store_in_cache(response, request=request, cache=cache, rules=[Rule()])
+
+    get_request = Request({**scope, "method": "GET"})
+    get = mock.patch.object(cache, "get", wraps=cache.get)
+    multi_get = mock.patch.object(cache, "multi_get", wraps=cache.multi_get)
+    with get as get_mock, multi_get as multi_get_mock:
+        cached_response = await get_from_cache(get_request, cache=cache, rules=[Rule()])
+    assert cached_response is not None
+    # Varying headers, along with the cache key shared by GET and HEAD requests.
+    multi_get_mock.assert_called_once()
+    get_mock.assert_not_called()
+
+
+async def test_get_from_cache_vary_fetches_response_once_known(
+    cache: BaseCache,
+) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [[b"accept-encoding", b"gzip"]],
+    }
+    request = Request(scope)
+    response = PlainTextResponse("Hello, world!", headers={"Vary": "Accept-Encoding"})
+    await store_in_cache(response, request=request, cache=cache, rules=[Rule()])
+
+    get = mock.patch.object(cache, "get", wraps=cache.get)
+    multi_get = mock.patch.object(cache, "multi_get", wraps=cache.multi_get)
+    with get as get_mock, multi_get as multi_get_mock:
+        cached_response = await get_from_cache(
+            Request(scope), cache=cache, rules=[Rule()]
+        )
+    assert cached_response is not None
+    assert cached_response.body == b"Hello, world!"
+    multi_get_mock.assert_called_once()
+    get_mock.assert_called_once()
+
+
+async def test_get_from_cache_vary_hit(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [
+            [b"accept", b"text/plain"],
+            [b"accept-encoding", b"gzip"],
+            [b"accept-encoding", b"identity"],
+        ],
+    }
+    request = Request(scope)
+    response = PlainTextResponse(
+        "Hello, world!", headers={"Vary": "Accept-Encoding, Accept-Language"}
+    )
+    await store_in_cache(response, request=request, cache=cache, rules=[Rule()])
+
+    # Only the first value of a varying header is taken into account.
+    other_scope = {**scope, "headers": [[b"accept-encoding", b"gzip"]]}
+    cached_response = await get_from_cache(
+        Request(other_scope), cache=cache, rules=[Rule()]
+    )
+    assert cached_response is not None
+    assert cached_response.body == b"Hello, world!"
+
+
+async def test_patch_cache_control_removes_empty_header() -> None:
+    headers = MutableHeaders({"Cache-Control": "must-revalidate"})
+    patch_cache_control(headers, must_revalidate=False)
+    assert "Cache-Control" not in headers
+
+
+async def test_generate_cache_key_is_stable_across_processes(cache: BaseCache) -> None:
+    code = (
+        "from aiocache import Cache\n"
+        "from starlette.datastructures import URL, Headers\n"
+        "from starlette_caches.utils.cache import generate_cache_key\n"
+        "print(generate_cache_key(URL('http://example.com/path?a=1'), 'GET',"
+        " Headers({'accept-encoding': 'gzip'}), ['accept-encoding'], Cache()))\n"
+    )
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, "-c", code, stdout=asyncio.subprocess.PIPE
+    )
+    stdout, _ = await process.communicate()
+    assert process.returncode == 0
+
+    key = generate_cache_key(
+        URL("http://example.com/path?a=1"),
+        "GET",
+        Headers({"accept-encoding": "gzip"}),
+        ["accept-encoding"],
+        cache,
+    )
+    assert stdout.decode().strip() == key
+    # Processes running other versions or installs may share the same cache, so any
+    # change to how keys are computed must be deliberate.
+    assert key == (
+        "cache_page.2bbdfee8b4596d79c543bd7d6c57e470.3f58f40ba502d92a41760fe36fa67739"
+    )
+
+
+@pytest.mark.parametrize(
+    ("first", "second"),
+    [
+        (
+            {"accept": "ab", "accept-language": ""},
+            {"accept": "a", "accept-language": "b"},
+        ),
+        ({"accept": "text/html"}, {"accept-language": "text/html"}),
+    ],
+)
+async def test_generate_cache_key_varying_headers_are_delimited(
+    cache: BaseCache, first: dict[str, str], second: dict[str, str]
+) -> None:
+    url = URL("http://example.com/path")
+    varying_headers = ["accept", "accept-language"]
+    assert generate_cache_key(
+        url, "GET", Headers(first), varying_headers, cache
+    ) != generate_cache_key(url, "GET", Headers(second), varying_headers, cache)
+
+
+async def test_generate_cache_key_varying_headers_order(cache: BaseCache) -> None:
+    url = URL("http://example.com/path")
+    headers = Headers({"accept": "text/html", "accept-language": "en"})
+    assert generate_cache_key(
+        url, "GET", headers, ["accept", "accept-language"], cache
+    ) == generate_cache_key(url, "GET", headers, ["accept-language", "accept"], cache)
+
+
+async def test_get_request_cache_key_maps_headers_once(cache: BaseCache) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/path",
+        "headers": [[b"accept", b"text/html"], [b"accept-language", b"en"]],
+    }
+    request = Request(scope)
+    url = request.url
+    headers = request.headers
+
+    with mock.patch.object(
+        cache_utils, "_first_header_values", wraps=cache_utils._first_header_values
+    ) as first_header_values:
+        assert get_request_cache_key(request, varying_headers=[]) == (
+            generate_cache_key(url, "GET", headers, [], cache)
+        )
+        assert first_header_values.call_count == 0
+
+        for varying_headers in ["accept"], ["accept", "accept-language"]:
+            assert get_request_cache_key(request, varying_headers=varying_headers) == (
+                generate_cache_key(url, "GET", headers, varying_headers, cache)
+            )
+    # Once for the request, and once for each call to generate_cache_key().
+    assert first_header_values.call_count == 3
+
+
+@pytest.mark.parametrize(
+    "changes",
+    [
+        {"scheme": "https"},
+        {"server": ("example.com", 8000)},
+        {"path": "/other"},
+        {"query_string": b"a=1"},
+    ],
+)
+async def test_get_request_cache_key_copied_scope(
+    cache: BaseCache, changes: dict[str, typing.Any]
+) -> None:
+    scope: Scope = {
+        "type": "http",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "path": "/path",
+        "query_string": b"",
+        "headers": [],
+    }
+    request = Request(scope)
+    key = get_request_cache_key(request, varying_headers=[])
+    assert key == generate_cache_key(request.url, "GET", request.headers, [], cache)
+
+    # Values memoized for the original request must not be reused.
+    other_request = Request({**scope, **changes})
+    other_key = get_request_cache_key(other_request, varying_headers=[])
+    assert other_key != key
+    assert other_key == generate_cache_key(
+        other_request.url, "GET", other_request.headers, [], cache
+    )
+
+
+async def test_parse_cache_control_is_memoized() -> None:
+    cache_utils.parse_cache_control.cache_clear()
+    for _ in range(2):
+        assert cache_utils.parse_cache_control("max-age=30, must-revalidate") == (
+            ("max-age", "30"),
+            ("must-revalidate", True),
+        )
+    assert cache_utils.parse_cache_control.cache_info().hits == 1
+
+
+async def test_parse_vary_is_memoized() -> None:
+    cache_utils.parse_vary.cache_clear()
+    for _ in range(2):
+        assert cache_utils.parse_vary("Accept-Encoding, Accept") == {
+            "accept-encoding",
+            "accept",
+        }
+    assert cache_utils.parse_vary.cache_info().hits == 1
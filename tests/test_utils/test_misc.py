@@ -1,10 +1,19 @@
 from __future__ import annotations
 
+import base64
 import typing
+from unittest import mock
 
 import pytest
 
-from starlette_caches.utils.misc import is_asgi3
+from starlette_caches.utils import misc
+from starlette_caches.utils.misc import (
+    bytes_to_json_string,
+    http_date,
+    is_asgi3,
+    json_string_to_bytes,
+    kvformat,
+)
 
 if typing.TYPE_CHECKING:
     from starlette.requests import Request
@@ -50,3 +59,45 @@ async def view(request: Request) -> Response: ...  # pragma: no cover
 )
 def test_is_asgi3(*, app: typing.Any, output: bool) -> None:
     assert is_asgi3(app) == output
+
+
+def test_is_asgi3_caches_functions_and_classes() -> None:
+    async def app(
+        scope: Scope, receive: Receive, send: Send
+    ) -> None: ...  # pragma: no cover
+
+    class App:
+        def __init__(
+            self, scope: Scope, receive: Receive, send: Send
+        ) -> None: ...  # pragma: no cover
+
+        def __await__(self) -> None: ...  # pragma: no cover
+
+    with mock.patch.object(
+        misc, "has_asgi3_signature", wraps=misc.has_asgi3_signature
+    ) as has_asgi3_signature:
+        assert is_asgi3(app)
+        assert is_asgi3(app)
+        assert is_asgi3(App)
+        assert is_asgi3(App)
+        assert has_asgi3_signature.call_count == 2
+
+
+def test_bytes_to_json_string_round_trip() -> None:
+    data = bytes(range(256)) * 4
+    value = bytes_to_json_string(data)
+    assert "\n" not in value
+    assert json_string_to_bytes(value) == data
+    # Values stored by previous versions were split into lines.
+    assert json_string_to_bytes(base64.encodebytes(data).decode("ascii")) == data
+
+
+def test_http_date() -> None:
+    assert http_date(0) == "Thu, 01 Jan 1970 00:00:00 GMT"
+    assert http_date(784111777.9) == "Sun, 06 Nov 1994 08:49:37 GMT"
+
+
+def test_kvformat() -> None:
+    assert (
+        kvformat(max_age=30, must_revalidate=True) == "max_age=30 must_revalidate=True"
+    )
@@ -11,6 +11,9 @@ from starlette.responses import Response
 
 import starlette_caches.utils.logging
 
+if typing.TYPE_CHECKING:
+    from starlette.types import ASGIApp
+
 
 class ComparableStarletteResponse:
     # As of 0.12, Starlette does not provide a '.__eq__()' implementation
@@ -44,6 +47,13 @@ class ComparableHTTPXResponse:
         )
 
 
+def asgi_client(app: ASGIApp) -> httpx.AsyncClient:
+    """Return an async HTTPX client sending requests directly to an ASGI app."""
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app), base_url="http://testserver"
+    )
+
+
 @contextlib.contextmanager
 def override_log_level(log_level: str) -> typing.Iterator[None]:
     os.environ["STARLETTE_CACHES_LOG_LEVEL"] = log_level